@@ -1,10 +1,29 @@
 import os
 import re
-import json
+import sys
+import asyncio
 import argparse
+import time
+import sqlite3
+import tempfile
+import contextlib
+from operator import itemgetter
+from urllib.parse import urlparse, parse_qs
 import google.generativeai as genai
+# The Batch API is only exposed by the newer google-genai SDK.
+from google import genai as google_genai
+from google.genai import errors as genai_errors
+from google.api_core.exceptions import DeadlineExceeded, ResourceExhausted, ServiceUnavailable
+from tenacity import retry, retry_if_exception_type, wait_exponential_jitter, stop_after_attempt
 from youtube_transcript_api import YouTubeTranscriptApi, NoTranscriptFound
 from tqdm import tqdm
+from diskcache import Cache
+import orjson
+
+# Transcripts are cached on disk so re-running on the same video does not
+# fetch them again.
+_transcript_cache = Cache(os.path.expanduser("~/.notes-gen-cache"))
+TRANSCRIPT_CACHE_EXPIRE = 7 * 86400
 
 def get_gemini_api_key():
     """Gets the Gemini API key from the environment variables."""
@@ -13,35 +32,83 @@ def get_gemini_api_key():
         raise ValueError("GEMINI_API_KEY environment variable not set.")
     return api_key
 
-def get_transcript(video_url: str) -> str:
+# Preferred transcript languages, in order.
+TRANSCRIPT_LANGUAGES = ['en', 'en-US', 'en-GB']
+
+# URL paths that carry the video ID as their next segment.
+_VIDEO_ID_PATH_PREFIXES = ("/shorts/", "/embed/")
+
+def extract_video_id(video_url: str) -> str:
+    """
+    Extracts the video ID from a YouTube URL.
+
+    Supports youtu.be short links, /shorts/ and /embed/ URLs, and watch URLs
+    with a v= query parameter in any position.
+
+    Args:
+        video_url: The URL of the YouTube video.
+
+    Returns:
+        The video ID.
+    """
+    parsed = urlparse(video_url)
+    if parsed.hostname and parsed.hostname.endswith("youtu.be"):
+        video_id = parsed.path.lstrip("/").split("/")[0]
+    elif parsed.path.startswith(_VIDEO_ID_PATH_PREFIXES):
+        video_id = parsed.path.split("/")[2]
+    else:
+        video_id = parse_qs(parsed.query).get("v", [""])[0]
+
+    if not video_id:
+        raise ValueError(f"Could not find a video ID in {video_url}.")
+    return video_id
+
+@_transcript_cache.memoize(expire=TRANSCRIPT_CACHE_EXPIRE)
+def _fetch_transcript(video_id: str) -> str:
+    """
+    Fetches the transcript for a YouTube video ID, preferring English.
+
+    Listing the transcripts is the only request besides fetching the chosen
+    one; picking the language from the list happens locally.
+    """
+    ytt_api = YouTubeTranscriptApi()
+    transcript_list = ytt_api.list(video_id)
+
+    try:
+        transcript = transcript_list.find_transcript(TRANSCRIPT_LANGUAGES)
+    except NoTranscriptFound:
+        # If English not found, take the first available transcript
+        transcript = next(iter(transcript_list))
+
+    fetched_transcript = transcript.fetch()
+    return " ".join(map(itemgetter('text'), fetched_transcript))
+
+def get_transcript(video_url: str, use_cache: bool = True) -> str:
     """
     Retrieves the transcript for a YouTube video.
 
     Args:
         video_url: The URL of the YouTube video.
+        use_cache: Whether to use the on-disk transcript cache.
 
     Returns:
         The transcript as a single string.
     """
     try:
-        video_id = video_url.split("v=")[1].split("&")[0]
-        ytt_api = YouTubeTranscriptApi()
-        transcript_list = ytt_api.list(video_id)
-
-        try:
-            transcript = transcript_list.find_transcript(['en'])
-        except NoTranscriptFound:
-            # If English not found, take the first available transcript
-            transcript = list(transcript_list)[0]
-
-        fetched_transcript = transcript.fetch()
-        transcript_text = " ".join([d['text'] for d in fetched_transcript])
-        return transcript_text
+        video_id = extract_video_id(video_url)
+        fetch = _fetch_transcript if use_cache else _fetch_transcript.__wrapped__
+        return fetch(video_id)
     except NoTranscriptFound:
         raise NoTranscriptFound("No transcript found for this video.")
     except Exception as e:
         raise Exception(f"An error occurred: {e}")
 
+# A simple regex to add periods at the end of sentences.
+# This looks for a lowercase letter followed by an uppercase letter,
+# which often indicates a sentence break without punctuation. Lookarounds
+# keep both letters out of the match so the replacement is a plain string.
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[a-z])(?=[A-Z])')
+
 def preprocess_transcript(text: str) -> str:
     """
     Preprocesses the transcript by inserting punctuation.
@@ -52,16 +119,43 @@ def preprocess_transcript(text: str) -> str:
     Returns:
         The preprocessed text with punctuation.
     """
-    # A simple regex to add periods at the end of sentences.
-    # This looks for a lowercase letter followed by an uppercase letter,
-    # which often indicates a sentence break without punctuation.
-    text = re.sub(r'([a-z])([A-Z])', r'\1. \2', text)
-    return text
+    return _SENTENCE_BOUNDARY.sub(". ", text)
+
+def iter_chunks(text: str, max_chunk_size: int = 8000):
+    """
+    Yields the chunks of the text in order.
+
+    Chunks are at most max_chunk_size characters long and only split at the
+    end of a sentence, so a single longer sentence becomes a chunk of its own.
+
+    Args:
+        text: The text to be chunked.
+        max_chunk_size: The maximum size of each chunk.
+
+    Yields:
+        The text chunks.
+    """
+    # Walk the sentence ends with str.find and slice each chunk out of the
+    # text directly, instead of splitting it into a list of sentences first.
+    start = 0  # Start of the current chunk.
+    end = 0  # End of the last complete sentence in the current chunk.
+    length = len(text)
+    while end < length:
+        next_dot = text.find(".", end)
+        sentence_end = length if next_dot == -1 else next_dot + 1
+        if sentence_end - start > max_chunk_size and end > start:
+            yield text[start:end]
+            start = end
+        end = sentence_end
+    if end > start:
+        yield text[start:end]
 
 def chunk_text(text: str, max_chunk_size: int = 8000) -> list[str]:
     """
     Splits the text into chunks of a specified maximum size.
 
+    See iter_chunks for how the text is split.
+
     Args:
         text: The text to be chunked.
         max_chunk_size: The maximum size of each chunk.
@@ -69,157 +163,665 @@ def chunk_text(text: str, max_chunk_size: int = 8000) -> list[str]:
     Returns:
         A list of text chunks.
     """
-    chunks = []
-    current_chunk = ""
-    for sentence in text.split("."):
-        if len(current_chunk) + len(sentence) < max_chunk_size:
-            current_chunk += sentence + "."
-        else:
-            chunks.append(current_chunk)
-            current_chunk = sentence + "."
-    if current_chunk:
-        chunks.append(current_chunk)
-    return chunks
+    return list(iter_chunks(text, max_chunk_size))
 
-PROMPT_START = """
-Act as an expert academic note-taker and content summarizer. Below is the first part of a long lecture transcript. Your task is to analyze this text and generate a comprehensive, structured, and detailed set of notes. The notes must be **written exclusively in simple English**, regardless of the input language.
+# Instructions shared by every request. They are sent as the system
+# instruction instead of being repeated in each prompt.
+SYSTEM_INSTRUCTION = """
+Act as an expert academic note-taker and content summarizer. You will be given a lecture transcript, or parts of a long one, and asked to turn it into a comprehensive, structured, and detailed set of notes. The notes must be **written exclusively in simple English**, regardless of the input language.
 
 Crucial Instructions:
 * Analyze the Provided Content: Carefully read the entire text. Identify key themes, definitions, examples, and rules.
 * Knowledge Augmentation: Supplement the notes with your own knowledge to enrich the content where the transcript is brief.
 * Note Structure: Organize the notes with clear headings, bolded key terms, bulleted/numbered lists, and proper formatting for examples and formulas.
-* Final Output: Provide the detailed notes for this section. Do not provide a final summary or conclusion.
+* Final Output: Unless asked for the notes of the whole lecture, provide the detailed notes for the given part only. Do not provide a final summary or conclusion.
 """
 
-PROMPT_CONTINUE = """
-Act as an expert academic note-taker and content summarizer. Below is another part of a long lecture transcript. Your task is to analyze this new content and seamlessly incorporate it into the existing notes, ensuring context is maintained and the final document is cohesive. The notes must be **written exclusively in simple English**, regardless of the input language.
+PROMPT_FULL = """
+Below is the complete transcript of a lecture. Generate the notes for the whole lecture, ending with a short summary or conclusion.
 
-Crucial Instructions:
-* Analyze and Integrate: Carefully read the new text and integrate the information into the notes you have already created. Add new sections, sub-points, definitions, and examples as needed.
-* Maintain Context: Do not treat this as a new request. Build directly upon the notes from the previous transcript part, which are provided below.
-* Knowledge Augmentation: Continue to use your own knowledge to supplement and enrich the notes where necessary.
-* Final Output: Provide the updated, more comprehensive set of notes. Do not provide a final summary or conclusion until all parts are provided.
+---
+Transcript:
+"""
+
+PROMPT_START = """
+Below is the first part of a long lecture transcript. Generate the notes for this part.
 
 ---
-Notes generated so far:
-{existing_notes}
+Transcript Part:
+"""
+
+PROMPT_CHUNK = """
+Below is another part of a long lecture transcript. Generate the notes for this new part so they can be placed directly after the notes for the previous part. The end of the previous transcript part is provided for context only; do not write notes for it again.
+
+---
+End of the previous transcript part:
+{previous_context}
 ---
 New Transcript Part:
 {new_transcript_chunk}
 """
 
-def generate_notes(video_url: str, resume_data=None) -> str:
+# PROMPT_CHUNK split around its two placeholders, so each chunk prompt is
+# assembled with a single join instead of parsing the format string again.
+_PROMPT_CHUNK_HEAD, _PROMPT_CHUNK_MIDDLE, _PROMPT_CHUNK_TAIL = re.split(
+    r"\{previous_context\}|\{new_transcript_chunk\}", PROMPT_CHUNK
+)
+
+MODEL_NAME = 'models/gemini-1.5-flash-latest'
+
+# Transcripts up to this many tokens are sent in a single request. Only
+# longer ones, which leave no room for the output in the 1M token context
+# window, are chunked.
+SINGLE_SHOT_MAX_TOKENS = 900_000
+
+# Size in characters of the chunks of a longer transcript, about 30k tokens.
+# Each chunk's notes must fit in the model's ~8k token output limit, so
+# larger chunks would only get compressed harder, not need fewer tokens.
+CHUNK_CHARS = 120_000
+
+# Below this many chunks the batch job overhead is not worth it and the
+# chunks are generated with regular requests instead.
+BATCH_MIN_CHUNKS = 4
+
+# Batch job states that mean the job is still waiting or running; any other
+# state is treated as final.
+_BATCH_ACTIVE_STATES = {"JOB_STATE_QUEUED", "JOB_STATE_PENDING", "JOB_STATE_RUNNING"}
+
+# Longest time to wait for a batch job before giving up. The job keeps
+# running and a resumed session reattaches to it.
+BATCH_TIMEOUT = 24 * 3600
+
+PROGRESS_DB = "progress.db"
+
+# Number of characters from the end of the previous chunk passed along as context.
+CONTEXT_CHARS = 800
+
+def build_prompt(transcript_chunks: list[str], index: int) -> str:
     """
-    Generates academic notes from a YouTube video.
+    Builds the prompt for a single transcript chunk.
+
+    Each prompt only depends on the transcript itself, not on previously
+    generated notes, so all chunks can be generated independently.
+
+    Args:
+        transcript_chunks: All chunks of the transcript.
+        index: The index of the chunk to build the prompt for.
+
+    Returns:
+        The prompt for the chunk.
+    """
+    chunk = transcript_chunks[index]
+    if len(transcript_chunks) == 1:
+        return PROMPT_FULL + chunk
+    if index == 0:
+        return PROMPT_START + chunk
+    previous_context = transcript_chunks[index - 1][-CONTEXT_CHARS:]
+    return "".join((_PROMPT_CHUNK_HEAD, previous_context, _PROMPT_CHUNK_MIDDLE, chunk, _PROMPT_CHUNK_TAIL))
+
+# Transient Gemini errors that are expected under concurrent requests.
+_RETRYABLE_ERRORS = (ResourceExhausted, ServiceUnavailable, DeadlineExceeded)
+
+@retry(
+    retry=retry_if_exception_type(_RETRYABLE_ERRORS),
+    wait=wait_exponential_jitter(initial=1, max=60),
+    stop=stop_after_attempt(6),
+    reraise=True,
+)
+async def _generate_with_retry(model, prompt: str, on_text=None) -> str:
+    """
+    Generates the response text for a prompt.
+
+    The response is streamed, and on_text, if given, is called with the
+    number of characters received so far in the current attempt as each
+    piece arrives. It starts again from zero when a request is retried.
+
+    Rate limits (429), overloads (503) and deadline errors are retried with
+    exponential backoff and jitter, up to six attempts. Any other error is
+    raised straight away.
+
+    Args:
+        model: The Gemini model.
+        prompt: The prompt to send.
+        on_text: Optional callback for the streamed character count.
+
+    Returns:
+        The response text.
+    """
+    response = await model.generate_content_async(prompt, stream=True)
+    parts = []
+    received = 0
+    async for piece in response:
+        parts.append(piece.text)
+        received += len(piece.text)
+        if on_text:
+            on_text(received)
+    return "".join(parts)
+
+class _NullBar:
+    """Stand-in for tqdm outside a terminal that prints one line per update to stderr."""
+
+    def __init__(self, total: int, initial: int = 0):
+        self.total = total
+        self.n = initial
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def update(self, n: int = 1) -> None:
+        self.n += n
+        print(f"[{self.n}/{self.total}]", file=sys.stderr, flush=True)
+
+    def set_postfix(self, **kwargs) -> None:
+        pass
+
+def progress_bar(total: int, initial: int = 0, desc: str = None):
+    """
+    Creates a progress bar for the note generation.
+
+    tqdm is only used when stderr is a terminal; when it is redirected to a
+    log file, a plain counter avoids filling the log with redraws.
+
+    Args:
+        total: The total number of steps.
+        initial: The number of steps already done.
+        desc: The description shown next to the bar.
+
+    Returns:
+        The progress bar.
+    """
+    if sys.stderr.isatty():
+        return tqdm(total=total, initial=initial, desc=desc)
+    return _NullBar(total, initial)
+
+def create_model():
+    """Creates the Gemini model with the shared system instruction."""
+    return genai.GenerativeModel(MODEL_NAME, system_instruction=SYSTEM_INSTRUCTION)
+
+def open_progress_db(path: str = PROGRESS_DB) -> sqlite3.Connection:
+    """
+    Opens the progress database, creating its tables if needed.
+
+    The database runs in WAL mode with synchronous=NORMAL, which keeps the
+    commit after every generated chunk cheap while staying crash safe.
+
+    Args:
+        path: The path of the database file.
+
+    Returns:
+        The database connection.
+    """
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS sessions (
+            video_url TEXT PRIMARY KEY,
+            created_ts REAL NOT NULL,
+            batch_job TEXT
+        );
+        CREATE TABLE IF NOT EXISTS chunks (
+            video_url TEXT NOT NULL,
+            idx INTEGER NOT NULL,
+            transcript_text TEXT NOT NULL,
+            notes_text TEXT,
+            done INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (video_url, idx)
+        );
+    """)
+    return conn
+
+def create_session(conn: sqlite3.Connection, video_url: str, transcript_chunks: list[str]) -> None:
+    """Stores a new session and its transcript chunks, replacing any old one."""
+    with conn:
+        conn.execute("DELETE FROM chunks WHERE video_url = ?", (video_url,))
+        conn.execute("DELETE FROM sessions WHERE video_url = ?", (video_url,))
+        conn.execute("INSERT INTO sessions (video_url, created_ts) VALUES (?, ?)", (video_url, time.time()))
+        conn.executemany(
+            "INSERT INTO chunks (video_url, idx, transcript_text) VALUES (?, ?, ?)",
+            ((video_url, i, chunk) for i, chunk in enumerate(transcript_chunks)),
+        )
+
+def load_session(conn: sqlite3.Connection, video_url: str):
+    """
+    Loads a previous session from the progress database.
 
     Args:
+        conn: The progress database connection.
         video_url: The URL of the YouTube video.
-        resume_data: Data to resume from a previous session.
 
     Returns:
-        The generated notes as a string.
+        The session data, or None if there is no session for the video.
+    """
+    row = conn.execute("SELECT batch_job FROM sessions WHERE video_url = ?", (video_url,)).fetchone()
+    if row is None:
+        return None
+
+    rows = conn.execute(
+        "SELECT transcript_text, notes_text, done FROM chunks WHERE video_url = ? ORDER BY idx",
+        (video_url,),
+    ).fetchall()
+    return {
+        "video_url": video_url,
+        "transcript_chunks": [transcript_text for transcript_text, _, _ in rows],
+        "per_chunk_notes": [notes_text if done else None for _, notes_text, done in rows],
+        "batch_job": row[0],
+    }
+
+def session_exists(conn: sqlite3.Connection, video_url: str) -> bool:
+    """Returns whether the progress database has a session for the video."""
+    return conn.execute("SELECT 1 FROM sessions WHERE video_url = ?", (video_url,)).fetchone() is not None
+
+def latest_session_url(conn: sqlite3.Connection):
+    """Returns the video URL of the most recent session, if any."""
+    row = conn.execute("SELECT video_url FROM sessions ORDER BY created_ts DESC LIMIT 1").fetchone()
+    return row[0] if row else None
+
+def save_chunk_notes(conn: sqlite3.Connection, video_url: str, notes) -> None:
+    """Marks chunks as done, given an iterable of (index, notes) pairs."""
+    with conn:
+        conn.executemany(
+            "UPDATE chunks SET notes_text = ?, done = 1 WHERE video_url = ? AND idx = ?",
+            ((chunk_notes, video_url, i) for i, chunk_notes in notes),
+        )
+
+def save_batch_job(conn: sqlite3.Connection, video_url: str, batch_job) -> None:
+    """Stores the name of the running batch job for a session."""
+    with conn:
+        conn.execute("UPDATE sessions SET batch_job = ? WHERE video_url = ?", (batch_job, video_url))
+
+def delete_session(conn: sqlite3.Connection, video_url: str) -> None:
+    """Removes a session and its chunks from the progress database."""
+    with conn:
+        conn.execute("DELETE FROM chunks WHERE video_url = ?", (video_url,))
+        conn.execute("DELETE FROM sessions WHERE video_url = ?", (video_url,))
+
+async def submit_batch(client, transcript_chunks: list[str], indices: list[int]) -> str:
+    """
+    Submits the prompts for the given chunks as a single batch job.
+
+    Args:
+        client: The google-genai client.
+        transcript_chunks: All chunks of the transcript.
+        indices: The indices of the chunks to include in the job.
+
+    Returns:
+        The name of the created batch job.
     """
+    f = tempfile.NamedTemporaryFile("wb", suffix=".jsonl", delete=False)
     try:
-        api_key = get_gemini_api_key()
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-pro')
-
-        if resume_data:
-            transcript_chunks = resume_data['transcript_chunks']
-            notes = resume_data['notes']
-            start_chunk = resume_data['chunk_index']
-        else:
+        with f:
+            for i in indices:
+                # Batch requests do not go through the model object, so each one
+                # carries the system instruction itself.
+                request = {
+                    "system_instruction": {"parts": [{"text": SYSTEM_INSTRUCTION}]},
+                    "contents": [{"role": "user", "parts": [{"text": build_prompt(transcript_chunks, i)}]}],
+                }
+                f.write(orjson.dumps({"key": str(i), "request": request}) + b"\n")
+        batch_file = await client.aio.files.upload(
+            file=f.name, config={"display_name": "notes-gen-batch", "mime_type": "jsonl"}
+        )
+    finally:
+        os.remove(f.name)
+    job = await client.aio.batches.create(model=MODEL_NAME, src=batch_file.name, config={"display_name": "notes-gen"})
+    return job.name
+
+async def wait_for_batch(client, job_name: str):
+    """
+    Polls a batch job with exponential backoff until it has finished.
+
+    Args:
+        client: The google-genai client.
+        job_name: The name of the batch job.
+
+    Returns:
+        The finished batch job.
+
+    Raises:
+        TimeoutError: If the job is still active after BATCH_TIMEOUT seconds.
+    """
+    deadline = time.monotonic() + BATCH_TIMEOUT
+    delay = 5
+    while True:
+        job = await client.aio.batches.get(name=job_name)
+        if job.state.name not in _BATCH_ACTIVE_STATES:
+            return job
+        if time.monotonic() + delay > deadline:
+            raise TimeoutError(f"Batch job {job_name} did not finish within {BATCH_TIMEOUT} seconds.")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 300)
+
+async def read_batch_results(client, job, per_chunk_notes: list) -> None:
+    """
+    Stores the notes from a finished batch job in per_chunk_notes.
+
+    Chunks whose request failed are left as None so that they are picked up
+    by the regular generation path.
+
+    Args:
+        client: The google-genai client.
+        job: The finished batch job.
+        per_chunk_notes: The notes for each chunk, updated in place.
+    """
+    if job.state.name != "JOB_STATE_SUCCEEDED":
+        print(f"Batch job {job.name} finished with state {job.state.name}.")
+        return
+
+    content = await client.aio.files.download(file=job.dest.file_name)
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        result = orjson.loads(line)
+        candidates = result.get("response", {}).get("candidates")
+        if not candidates:
+            continue
+        parts = candidates[0].get("content", {}).get("parts", [])
+        per_chunk_notes[int(result["key"])] = "".join(part.get("text", "") for part in parts)
+
+async def generate_notes_batch(conn: sqlite3.Connection, progress: dict, pending: list[int]) -> None:
+    """
+    Generates the notes for the pending chunks through the Gemini Batch API.
+
+    The batch job name is saved to the progress database right after
+    submission so that a resumed session reattaches to the running job. If
+    that job no longer exists, the pending chunks are submitted again.
+
+    Args:
+        conn: The progress database connection.
+        progress: The progress of the current session, updated in place.
+        pending: The indices of the chunks without notes.
+    """
+    video_url = progress["video_url"]
+    client = google_genai.Client(api_key=get_gemini_api_key())
+    job = None
+    if progress.get("batch_job"):
+        print(f"Reattaching to batch job {progress['batch_job']}...")
+        try:
+            job = await wait_for_batch(client, progress["batch_job"])
+        except genai_errors.APIError as e:
+            # Batch jobs are deleted eventually; submit the chunks again.
+            if e.code != 404:
+                raise
+            print(f"Batch job {progress['batch_job']} no longer exists.")
+            progress["batch_job"] = None
+            save_batch_job(conn, video_url, None)
+
+    if job is None:
+        progress["batch_job"] = await submit_batch(client, progress["transcript_chunks"], pending)
+        save_batch_job(conn, video_url, progress["batch_job"])
+        print(f"Submitted batch job {progress['batch_job']}.")
+        print("Waiting for batch job to finish...")
+        job = await wait_for_batch(client, progress["batch_job"])
+
+    per_chunk_notes = progress["per_chunk_notes"]
+    await read_batch_results(client, job, per_chunk_notes)
+    save_chunk_notes(conn, video_url, ((i, per_chunk_notes[i]) for i in pending if per_chunk_notes[i] is not None))
+    progress["batch_job"] = None
+    save_batch_job(conn, video_url, None)
+
+async def generate_notes_async(
+    video_url: str,
+    *,
+    progress_path: str = None,
+    resume: bool = True,
+    use_cache: bool = True,
+    delete_session_on_success: bool = True,
+) -> str:
+    """
+    Generates academic notes from a YouTube video.
+
+    Most transcripts fit in the model's context window and are turned into
+    notes with a single request. Longer ones are chunked: notes are
+    generated separately for each chunk, each prompt carrying the end of the
+    previous chunk as context, and the part notes are joined in order.
+    Videos with at least BATCH_MIN_CHUNKS chunks go through the Gemini Batch
+    API. Shorter videos, and any chunks the batch job failed on, are sent to
+    Gemini concurrently, with at most GEMINI_PARALLELISM (default 8)
+    requests in flight at once.
+
+    Args:
+        video_url: The URL of the YouTube video.
+        progress_path: The progress database to save the session to. The
+            session is only kept in memory if not given.
+        resume: Whether to resume a previous session for the video.
+        use_cache: Whether to use the on-disk transcript cache.
+        delete_session_on_success: Whether to delete the session once the
+            notes are generated. Callers that still need to save the notes
+            pass False and delete it themselves afterwards.
+
+    Returns:
+        The generated notes as a string, empty if the transcript is empty.
+    """
+    genai.configure(api_key=get_gemini_api_key())
+
+    with contextlib.closing(open_progress_db(progress_path or ":memory:")) as conn:
+        progress = load_session(conn, video_url) if resume else None
+        if progress is None:
             print("Fetching transcript...")
-            transcript = get_transcript(video_url)
+            transcript = get_transcript(video_url, use_cache)
             print("Preprocessing transcript...")
             preprocessed_transcript = preprocess_transcript(transcript)
-            print("Chunking transcript...")
-            transcript_chunks = chunk_text(preprocessed_transcript)
-            notes = ""
-            start_chunk = 0
-
-        with tqdm(total=len(transcript_chunks), desc="Generating Notes", initial=start_chunk) as pbar:
-            for i, chunk in enumerate(transcript_chunks[start_chunk:]):
-                current_chunk_index = start_chunk + i
-                try:
-                    if current_chunk_index == 0:
-                        prompt = PROMPT_START + chunk
-                    else:
-                        prompt = PROMPT_CONTINUE.format(existing_notes=notes, new_transcript_chunk=chunk)
-
-                    response = model.generate_content(prompt)
-                    notes = response.text
-                    pbar.update(1)
-
-                    # Save progress
-                    progress = {
-                        "video_url": video_url,
-                        "transcript_chunks": transcript_chunks,
-                        "notes": notes,
-                        "chunk_index": current_chunk_index + 1
-                    }
-                    with open("progress.json", "w") as f:
-                        json.dump(progress, f)
-
-                except Exception as e:
-                    print(f"An error occurred during note generation: {e}")
-                    print("Saving progress and exiting.")
-                    return notes
-
+            if not preprocessed_transcript.strip():
+                return ""
+            token_count = await genai.GenerativeModel(MODEL_NAME).count_tokens_async(preprocessed_transcript)
+            if token_count.total_tokens <= SINGLE_SHOT_MAX_TOKENS:
+                transcript_chunks = [preprocessed_transcript]
+            else:
+                print("Chunking transcript...")
+                transcript_chunks = chunk_text(preprocessed_transcript, CHUNK_CHARS)
+            create_session(conn, video_url, transcript_chunks)
+            progress = {
+                "video_url": video_url,
+                "transcript_chunks": transcript_chunks,
+                "per_chunk_notes": [None] * len(transcript_chunks),
+                "batch_job": None,
+            }
+
+        transcript_chunks = progress["transcript_chunks"]
+        per_chunk_notes = progress["per_chunk_notes"]
+        pending = [i for i, chunk_notes in enumerate(per_chunk_notes) if chunk_notes is None]
+        if progress["batch_job"] or len(pending) >= BATCH_MIN_CHUNKS:
+            await generate_notes_batch(conn, progress, pending)
+            pending = [i for i, chunk_notes in enumerate(per_chunk_notes) if chunk_notes is None]
+
+        model = create_model()
+
+        sem = asyncio.Semaphore(int(os.environ.get("GEMINI_PARALLELISM", "8")))
+        errors = []
+
+        with progress_bar(len(transcript_chunks), len(transcript_chunks) - len(pending), "Generating Notes") as pbar:
+            # Characters received per chunk, so a retried request replaces
+            # the count of its failed attempt instead of adding to it.
+            received_by_chunk = {}
+            total_received = 0
+
+            def show_received(index: int, received: int) -> None:
+                nonlocal total_received
+                total_received += received - received_by_chunk.get(index, 0)
+                received_by_chunk[index] = received
+                pbar.set_postfix(received=f"{total_received:,} chars")
+
+            async def generate(index: int) -> None:
+                async with sem:
+                    # After a failure, skip the chunks that have not started yet.
+                    if errors:
+                        return
+                    try:
+                        per_chunk_notes[index] = await _generate_with_retry(
+                            model,
+                            build_prompt(transcript_chunks, index),
+                            lambda received: show_received(index, received),
+                        )
+                    except Exception as e:
+                        errors.append(e)
+                        return
+                save_chunk_notes(conn, video_url, [(index, per_chunk_notes[index])])
+                pbar.update(1)
+
+            await asyncio.gather(*(generate(i) for i in pending))
+
+        if errors:
+            raise errors[0]
+
+        notes = "\n\n".join(per_chunk_notes)
+
+        if delete_session_on_success:
+            delete_session(conn, video_url)
         return notes
 
-    except Exception as e:
-        return f"An error occurred: {e}"
+def generate_notes(
+    video_url: str,
+    *,
+    progress_path: str = None,
+    resume: bool = True,
+    use_cache: bool = True,
+    delete_session_on_success: bool = True,
+) -> str:
+    """
+    Generates academic notes from a YouTube video.
 
+    Synchronous wrapper around generate_notes_async. It has no side effects
+    besides the transcript cache and, if given, the progress database.
 
-def main():
-    """Main function to run the program."""
+    Args:
+        video_url: The URL of the YouTube video.
+        progress_path: The progress database to save the session to.
+        resume: Whether to resume a previous session for the video.
+        use_cache: Whether to use the on-disk transcript cache.
+        delete_session_on_success: Whether to delete the session once the
+            notes are generated.
+
+    Returns:
+        The generated notes as a string.
+    """
+    return asyncio.run(generate_notes_async(
+        video_url,
+        progress_path=progress_path,
+        resume=resume,
+        use_cache=use_cache,
+        delete_session_on_success=delete_session_on_success,
+    ))
+
+
+def ask_resume(video_url: str) -> bool:
+    """Asks whether to resume the previous session for a video."""
+    while True:
+        choice = input(f"A previous session was found for {video_url}. Do you want to (r)esume or (s)tart over? ").lower()
+        if choice in ['r', 's']:
+            return choice == 'r'
+        print("Invalid choice. Please enter 'r' or 's'.")
+
+async def generate_all_notes(video_urls: list[str], use_cache: bool = True) -> None:
+    """
+    Generates the notes for each video and saves them to a text file.
+
+    A failed video is reported and skipped; any progress it made stays in
+    PROGRESS_DB for resuming. A session is only deleted once its notes have
+    been written, so a failed write can be resumed too.
+
+    Args:
+        video_urls: The URLs of the YouTube videos.
+        use_cache: Whether to use the on-disk transcript cache.
+    """
+    for video_url in video_urls:
+        if len(video_urls) > 1:
+            print(f"\n{video_url}")
+        try:
+            notes = await generate_notes_async(
+                video_url,
+                progress_path=PROGRESS_DB,
+                use_cache=use_cache,
+                delete_session_on_success=False,
+            )
+        except Exception as e:
+            print(f"\nAn error occurred: {e}")
+            with contextlib.closing(open_progress_db()) as conn:
+                if session_exists(conn, video_url):
+                    print("Progress has been saved; run again to resume.")
+            continue
+
+        if len(video_urls) > 1:
+            output_filename = f"academic_notes_{extract_video_id(video_url)}.txt"
+        else:
+            output_filename = "academic_notes.txt"
+        try:
+            with open(output_filename, "w") as f:
+                f.write(notes)
+        except OSError as e:
+            print(f"\nCould not save the notes to {output_filename}: {e}")
+            with contextlib.closing(open_progress_db()) as conn:
+                if session_exists(conn, video_url):
+                    print("Progress has been saved; run again to resume.")
+            continue
+        with contextlib.closing(open_progress_db()) as conn:
+            delete_session(conn, video_url)
+        print(f"\nNotes successfully generated and saved to {output_filename}")
+
+
+def unique_video_urls(video_urls: list[str]) -> list[str]:
+    """
+    Removes URLs that point to a video already in the list.
+
+    Args:
+        video_urls: The URLs of the YouTube videos.
+
+    Returns:
+        The URLs in order, keeping the first URL for each video.
+    """
+    seen = set()
+    unique = []
+    for video_url in video_urls:
+        try:
+            video_id = extract_video_id(video_url)
+        except ValueError:
+            # Left for generate_notes to report.
+            video_id = video_url
+        if video_id in seen:
+            print(f"Skipping {video_url}: same video as an earlier URL.")
+            continue
+        seen.add(video_id)
+        unique.append(video_url)
+    return unique
+
+
+def cli_main():
+    """Command line entry point: handles arguments and prompts, then generates the notes."""
     parser = argparse.ArgumentParser(description="YouTube Academic Note Generator")
-    parser.add_argument("video_url", help="The URL of the YouTube video.", nargs='?')
+    parser.add_argument("video_urls", help="The URLs of the YouTube videos.", nargs='*')
+    parser.add_argument("--no-cache", action="store_true", help="Fetch the transcript again instead of using the cached copy.")
     args = parser.parse_args()
 
     print("YouTube Academic Note Generator")
-    resume_data = None
-    video_url = args.video_url
-
-    if os.path.exists("progress.json"):
-        with open("progress.json", "r") as f:
-            progress = json.load(f)
-
-        if not video_url or video_url == progress['video_url']:
-            while True:
-                choice = input("A previous session was found. Do you want to (r)esume or (s)tart over? ").lower()
-                if choice in ['r', 's']:
-                    break
-                print("Invalid choice. Please enter 'r' or 's'.")
-
-            if choice == 'r':
-                resume_data = progress
-                video_url = progress['video_url']
+    video_urls = unique_video_urls(args.video_urls)
+
+    # Sessions the user does not want to resume are removed here, so the
+    # videos left over resume whatever is still stored.
+    with contextlib.closing(open_progress_db()) as conn:
+        if video_urls:
+            for video_url in video_urls:
+                if session_exists(conn, video_url) and not ask_resume(video_url):
+                    delete_session(conn, video_url)
+                    print("Starting over...")
+        elif (session_url := latest_session_url(conn)):
+            if ask_resume(session_url):
+                video_urls = [session_url]
                 print("Resuming note generation...")
             else:
-                os.remove("progress.json")
+                delete_session(conn, session_url)
                 print("Starting over...")
-        else:
-            print("A new video URL was provided, starting over...")
-            os.remove("progress.json")
-
 
-    if not video_url:
-        video_url = input("Enter the YouTube video URL: ")
+    if not video_urls:
+        video_urls = [input("Enter the YouTube video URL: ")]
 
-    notes = generate_notes(video_url, resume_data)
-
-    if "An error occurred" not in notes:
-        output_filename = "academic_notes.txt"
-        with open(output_filename, "w") as f:
-            f.write(notes)
-        print(f"\nNotes successfully generated and saved to {output_filename}")
-        if os.path.exists("progress.json"):
-            os.remove("progress.json")
-    else:
-        print(f"\n{notes}")
+    try:
+        asyncio.run(generate_all_notes(video_urls, use_cache=not args.no_cache))
+    except Exception as e:
+        print(f"\nAn error occurred: {e}")
 
 
 if __name__ == "__main__":
-    main()
+    cli_main()
@@ -1,10 +1,16 @@
 from youtube_transcript_api import YouTubeTranscriptApi
 
-print("Attributes of YouTubeTranscriptApi class:")
-print(dir(YouTubeTranscriptApi))
-
-print("\nAttributes of a YouTubeTranscriptApi instance:")
-try:
-    print(dir(YouTubeTranscriptApi()))
-except Exception as e:
-    print(f"Failed to create instance: {e}")
+
+def main():
+    print("Attributes of YouTubeTranscriptApi class:")
+    print(dir(YouTubeTranscriptApi))
+
+    print("\nAttributes of a YouTubeTranscriptApi instance:")
+    try:
+        print(dir(YouTubeTranscriptApi()))
+    except Exception as e:
+        print(f"Failed to create instance: {e}")
+
+
+if __name__ == "__main__":
+    main()